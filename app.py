@@ -1,20 +1,35 @@
 import os
+import re
 import io
+import shutil
+import threading
+import time
 import logging
+from contextlib import contextmanager
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from flask import Flask, Response, g, render_template, request, redirect, url_for, flash, jsonify, abort, stream_with_context
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
 from werkzeug.utils import secure_filename
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
+from passlib.hash import argon2
 from models import db, User, Photo, Like, Comment, Save
-from textblob import TextBlob
-from PIL import Image, ImageStat
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+from PIL import Image, features
+import numpy as np
+from sqlalchemy import func, inspect, select, insert, update, delete, exists, union, bindparam, tuple_
+from sqlalchemy.orm import joinedload
+from sqlalchemy.schema import CreateIndex
+from cachetools import TTLCache
 from dotenv import load_dotenv
 import urllib.parse
 
 
 # --- AZURE STORAGE LIBRARY ---
-from azure.storage.blob import BlobServiceClient
+from azure.storage.blob import BlobServiceClient, ContentSettings
+from azure.core.pipeline.transport import RequestsTransport
+import requests
 
 # .env file se variables load karein
 load_dotenv()
@@ -48,7 +63,10 @@ SQLALCHEMY_DATABASE_URI = None
 
 if raw_conn:
     if '://' in raw_conn:
-        SQLALCHEMY_DATABASE_URI = raw_conn
+        # Route plain postgres URLs through the psycopg 3 driver (C fast path via psycopg[binary])
+        scheme, rest = raw_conn.split('://', 1)
+        if scheme in ('postgres', 'postgresql'): scheme = 'postgresql+psycopg'
+        SQLALCHEMY_DATABASE_URI = f"{scheme}://{rest}"
     else:
         try:
             # Azure-style Key-Value parsing logic taake SQLalchemy connect ho sakay
@@ -58,7 +76,7 @@ if raw_conn:
             host = conn_params.get('host', 'localhost')
             port = conn_params.get('port', '5432')
             dbname = conn_params.get('dbname') or conn_params.get('database')
-            SQLALCHEMY_DATABASE_URI = f"postgresql://{user}:{password}@{host}:{port}/{dbname}?sslmode=require"
+            SQLALCHEMY_DATABASE_URI = f"postgresql+psycopg://{user}:{password}@{host}:{port}/{dbname}?sslmode=require"
         except Exception as e:
             logger.warning("DB Parsing failed; using raw value: %s", e)
             SQLALCHEMY_DATABASE_URI = raw_conn
@@ -71,6 +89,18 @@ else:
 
 app.config['SQLALCHEMY_DATABASE_URI'] = SQLALCHEMY_DATABASE_URI
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Larger compiled-SQL cache (default 500) so hot statements are compiled once per process
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'query_cache_size': 1200}
+if SQLALCHEMY_DATABASE_URI.startswith('postgresql'):
+    # Explicit pool (default is 5 + 10 overflow, no pre-ping) and server-side timeouts so a stuck query can't pin a worker
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'].update({
+        'pool_size': int(os.getenv('DB_POOL_SIZE', '20')),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '10')),
+        'pool_pre_ping': True,
+        'pool_recycle': 1800,
+        'connect_args': {'options': '-c statement_timeout=5000 -c lock_timeout=2000',
+                         'application_name': 'pixelpulse'},
+    })
 
 # --- AZURE BLOB STORAGE CONFIGURATION ---
 AZURE_CONNECTION_STRING = os.getenv('AZURE_STORAGE_CONNECTION_STRING')
@@ -80,22 +110,201 @@ AZURE_CONTAINER_NAME = os.getenv('AZURE_CONTAINER_NAME', 'photos')
 LOCAL_UPLOAD_FOLDER = os.path.join(app.root_path, 'static', 'uploads')
 os.makedirs(LOCAL_UPLOAD_FOLDER, exist_ok=True)
 
+UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', '8'))
+
 blob_service_client = None
+container_client = None
 if AZURE_CONNECTION_STRING:
     try:
-        blob_service_client = BlobServiceClient.from_connection_string(AZURE_CONNECTION_STRING)
+        # One keep-alive HTTP session for all blob calls so TCP/TLS setup is reused
+        blob_session = requests.Session()
+        blob_session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=UPLOAD_WORKERS * 4))
+        blob_service_client = BlobServiceClient.from_connection_string(
+            AZURE_CONNECTION_STRING, transport=RequestsTransport(session=blob_session, session_owner=False))
+        container_client = blob_service_client.get_container_client(AZURE_CONTAINER_NAME)
         logger.info('Azure Blob Storage initialized successfully.')
     except Exception as e:
         logger.error('Azure Storage Error: %s', e)
 
+# Blob uploads run off the request thread; the Photo row stays 'pending' until done
+upload_executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix='blob-upload')
+
 # Database Initialize
 db.init_app(app)
 
+# --- POSTGRES SEARCH INDEXES ---
+# Leading-wildcard ILIKE can't use B-tree indexes, so on Postgres the feed search
+# goes through a tsvector GIN index (photo text) and a trigram GIN index (username).
+SEARCH_TSV_COLUMN_DDL = [
+    "ALTER TABLE photo ADD COLUMN IF NOT EXISTS search_tsv tsvector GENERATED ALWAYS AS "
+    "(to_tsvector('simple', coalesce(title,'') || ' ' || coalesce(caption,'') || ' ' || coalesce(location,''))) STORED",
+]
+SEARCH_TSV_INDEX_DDL = [
+    "CREATE INDEX IF NOT EXISTS photo_search_gin ON photo USING gin(search_tsv)",
+]
+USERNAME_TRGM_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    'CREATE INDEX IF NOT EXISTS user_username_trgm ON "user" USING gin(username gin_trgm_ops)',
+]
+# lower(username) with text_pattern_ops serves the case-insensitive profile lookup and LIKE 'prefix%'
+USERNAME_LOWER_DDL = [
+    'CREATE INDEX IF NOT EXISTS user_username_lower ON "user" (lower(username) text_pattern_ops)',
+]
+SEARCH_TSV_ENABLED = False
+
+@contextmanager
+def _ddl_connection():
+    # Startup migrations (backfills, table rewrites, index builds) can outlast the request-sized
+    # timeouts in connect_args; lift them for this transaction only, keeping a bounded lock wait
+    with db.engine.begin() as conn:
+        if conn.dialect.name == 'postgresql':
+            conn.execute(db.text("SET LOCAL statement_timeout = 0"))
+            conn.execute(db.text("SET LOCAL lock_timeout = '30s'"))
+        yield conn
+
+def _run_ddl(statements):
+    with _ddl_connection() as conn:
+        for stmt in statements:
+            conn.execute(db.text(stmt))
+
+def _has_search_tsv():
+    return 'search_tsv' in {c['name'] for c in inspect(db.engine).get_columns('photo')}
+
+def _ensure_search_indexes():
+    if db.engine.dialect.name != 'postgresql':
+        return
+    # Only run DDL for what's missing: ALTER TABLE takes an ACCESS EXCLUSIVE lock even with IF NOT EXISTS
+    inspector = inspect(db.engine)
+    indexes = ({i['name'] for i in inspector.get_indexes('photo')} |
+               {i['name'] for i in inspector.get_indexes('user')})
+    steps = [
+        (not _has_search_tsv(), SEARCH_TSV_COLUMN_DDL, 'Full-text search column setup failed.'),
+        ('photo_search_gin' not in indexes, SEARCH_TSV_INDEX_DDL, 'Full-text search index setup failed.'),
+        ('user_username_lower' not in indexes, USERNAME_LOWER_DDL, 'lower(username) index setup failed.'),
+    ]
+    for missing, statements, error in steps:
+        if not missing: continue
+        try:
+            _run_ddl(statements)
+        except Exception:
+            logger.exception(error)
+    if 'user_username_trgm' not in indexes:
+        try:
+            _run_ddl(USERNAME_TRGM_DDL)
+        except Exception as e:
+            logger.warning('pg_trgm index not created (extension may not be allow-listed): %s', e)
+
+def _detect_search_mode():
+    global SEARCH_TSV_ENABLED
+    if db.engine.dialect.name != 'postgresql':
+        return
+    # Decide from the schema, not from this process's DDL, so every worker searches the same way
+    SEARCH_TSV_ENABLED = _has_search_tsv()
+    if not SEARCH_TSV_ENABLED:
+        logger.warning('photo.search_tsv missing; feed search will use ILIKE.')
+
+# One-off data fills for columns that are added to an existing table (must be safe to re-run:
+# a worker that loses the ADD COLUMN race to a sibling runs the fill again)
+COLUMN_BACKFILLS = {
+    # One grouped pass over likes (a correlated count per photo is quadratic before ix_likes_photo_user exists);
+    # photos without likes keep the column's server default of 0
+    ('photo', 'likes_count'): "UPDATE photo SET likes_count = c.n FROM "
+                              "(SELECT photo_id, count(*) AS n FROM likes GROUP BY photo_id) AS c WHERE c.photo_id = photo.id",
+}
+
+def _ensure_model_columns():
+    # create_all() won't add new columns to existing tables; add them with their server defaults
+    inspector = inspect(db.engine)
+    prep = db.engine.dialect.identifier_preparer
+    # Workers boot together; on Postgres IF NOT EXISTS lets the ones that lose the race no-op (SQLite has no such clause)
+    if_not_exists = 'IF NOT EXISTS ' if db.engine.dialect.name == 'postgresql' else ''
+    for table in db.metadata.sorted_tables:
+        existing = {c['name'] for c in inspector.get_columns(table.name)}
+        for col in table.columns:
+            if col.name in existing: continue
+            ddl = f"ALTER TABLE {prep.format_table(table)} ADD COLUMN {if_not_exists}{prep.format_column(col)} {col.type.compile(dialect=db.engine.dialect)}"
+            default = col.server_default.arg if col.server_default is not None else None
+            if isinstance(default, str): ddl += f" DEFAULT '{default}'"
+            elif default is not None: ddl += f" DEFAULT {default.text}"
+            if not col.nullable: ddl += " NOT NULL"
+            try:
+                with _ddl_connection() as conn:
+                    conn.execute(db.text(ddl))
+                    if (table.name, col.name) in COLUMN_BACKFILLS:
+                        conn.execute(db.text(COLUMN_BACKFILLS[(table.name, col.name)]))
+            except Exception:
+                logger.exception('Adding column %s.%s failed.', table.name, col.name)
+                continue
+            logger.info('Added missing column %s.%s', table.name, col.name)
+
+_EPOCH = datetime(1970, 1, 1)  # stored datetimes are naive UTC
+
+# Keyset pagination sorts on these; legacy NULLs get the epoch (oldest) and the column becomes NOT NULL
+NOT_NULL_BACKFILLS = {
+    ('photo', 'uploaded_at'): _EPOCH,
+    ('likes', 'timestamp'): _EPOCH,
+    ('saves', 'timestamp'): _EPOCH,
+}
+
+def _ensure_not_null_columns():
+    # create_all() won't tighten existing columns; SQLite can't ALTER them, so there the fill just repeats per boot
+    inspector = inspect(db.engine)
+    prep = db.engine.dialect.identifier_preparer
+    for (table_name, col_name), fill in NOT_NULL_BACKFILLS.items():
+        if not next(c for c in inspector.get_columns(table_name) if c['name'] == col_name)['nullable']: continue
+        col = db.metadata.tables[table_name].c[col_name]
+        try:
+            with _ddl_connection() as conn:
+                conn.execute(update(col.table).where(col.is_(None)).values({col: fill}))
+                if conn.dialect.name == 'postgresql':
+                    conn.execute(db.text(f"ALTER TABLE {prep.format_table(col.table)} ALTER COLUMN {prep.format_column(col)} SET NOT NULL"))
+                    logger.info('Made %s.%s NOT NULL', table_name, col_name)
+        except Exception:
+            logger.exception('Backfilling NULL %s.%s failed.', table_name, col_name)
+
+def _ensure_model_indexes():
+    # create_all() skips tables that already exist, so add any indexes missing on older databases
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing = {i['name'] for i in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing: continue
+            try:
+                # IF NOT EXISTS: a sibling worker may have created it since the inspect
+                with _ddl_connection() as conn:
+                    conn.execute(CreateIndex(index, if_not_exists=True))
+            except Exception:
+                logger.exception('Creating index %s failed.', index.name)
+
+MIGRATION_LOCK_KEY = 0x7069786C  # arbitrary app-wide pg_advisory lock id
+
+@contextmanager
+def _migration_lock():
+    # Workers boot together: on Postgres one runs the migrations while the rest wait (no timeout), then find nothing to do
+    if db.engine.dialect.name != 'postgresql':
+        yield
+        return
+    with db.engine.begin() as conn:
+        conn.execute(db.text("SET LOCAL statement_timeout = 0"))
+        conn.execute(db.text("SET LOCAL lock_timeout = 0"))
+        conn.execute(db.text("SELECT pg_advisory_xact_lock(:key)"), {'key': MIGRATION_LOCK_KEY})
+        yield
+
+def _create_tables():
+    db.create_all()
+    logger.info('Database tables checked/created.')
+
 # Auto-create tables on startup
 with app.app_context():
     try:
-        db.create_all()
-        logger.info('Database tables checked/created.')
+        with _migration_lock():
+            # Run every step even if an earlier one failed, so search still picks its mode from the schema
+            for step in (_create_tables, _ensure_model_columns, _ensure_not_null_columns,
+                         _ensure_model_indexes, _ensure_search_indexes, _detect_search_mode):
+                try:
+                    step()
+                except Exception:
+                    logger.exception('Startup step %s failed.', step.__name__)
     except Exception as e:
         logger.exception('Critical: DB Connection Failed. Check Firewall!')
 
@@ -103,42 +312,84 @@ login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 
+# Detached User snapshots keyed by id; merged into each request's session without a SELECT
+_USER_CACHE = TTLCache(maxsize=10_000, ttl=60)
+_USER_CACHE_LOCK = threading.Lock()
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    uid = int(user_id)
+    with _USER_CACHE_LOCK:
+        cached = _USER_CACHE.get(uid)
+    if cached is None:
+        cached = db.session.get(User, uid)
+        if cached is None: return None
+        db.session.expunge(cached)
+        with _USER_CACHE_LOCK:
+            _USER_CACHE[uid] = cached
+    return db.session.merge(cached, load=False)
+
+# --- PASSWORD HASHING ---
+# argon2id with explicit cost (OWASP baseline: 19 MiB, t=2, p=1); tune per host via env
+password_hasher = argon2.using(type='ID', memory_cost=int(os.getenv('ARGON2_MEMORY_COST', '19456')),
+                               time_cost=int(os.getenv('ARGON2_TIME_COST', '2')), parallelism=1)
+
+def verify_password(user, password):
+    """Check a login password; legacy Werkzeug hashes are re-hashed to argon2id on success."""
+    if argon2.identify(user.password):
+        if not password_hasher.verify(password, user.password): return False
+        if not password_hasher.needs_update(user.password): return True
+    elif not check_password_hash(user.password, password):
+        return False
+    user.password = password_hasher.hash(password)
+    db.session.commit()
+    with _USER_CACHE_LOCK:
+        _USER_CACHE.pop(user.id, None)
+    return True
 
 # --- TEMPLATE FILTERS ---
+@app.before_request
+def _stamp_request_time():
+    # One clock read per request, shared by every timeago call in the page
+    g.now_ts = time.time()
+
 @app.template_filter('timeago')
 def timeago(date):
-    if not date: 
+    if not date or date == _EPOCH:  # the epoch marks a backfilled legacy NULL
         return "Recently"  # Crash fix: Agar date NULL ho to crash nahi karega
-    diff = datetime.utcnow() - date
-    s = diff.total_seconds()
+    now = g.now_ts if 'now_ts' in g else time.time()  # no before_request stamp outside a request
+    s = now - (date - _EPOCH).total_seconds()
     if s < 60: return "Just now"
     if s < 3600: return f"{int(s//60)}m ago"
     if s < 86400: return f"{int(s//3600)}h ago"
     return f"{int(s//86400)}d ago"
 
+@app.template_filter('srcset')
+def srcset(variants):
+    # JSON round-trips the width keys as strings
+    return ', '.join(f"{url} {w}w" for w, url in sorted(variants.items(), key=lambda kv: int(kv[0])))
+
 # --- DETAILED AI IMAGE ANALYSIS ---
-def analyze_image(img_obj):
+def analyze_image(img_obj, source_size=None):
+    # source_size: original (width, height) when img_obj is an already-downscaled copy
     tags = []
     try:
         if img_obj.mode != 'RGB': img_obj = img_obj.convert('RGB')
         
         # 1. Quality Analysis
-        width, height = img_obj.size
+        width, height = source_size or img_obj.size
         tags.append("HD ᴴᴰ" if width * height > 1000000 else "SD")
 
-        # 2. Brightness Analysis
-        stat = ImageStat.Stat(img_obj.convert('L'))
-        brightness = stat.mean[0]
+        # Per-channel means in one pass over the pixels (no L-conversion or resize copies)
+        r, g, b = np.asarray(img_obj).reshape(-1, 3).mean(axis=0)
+
+        # 2. Brightness Analysis (same luma weights as PIL's 'L' mode)
+        brightness = 0.299 * r + 0.587 * g + 0.114 * b
         if brightness > 150: tags.append("Bright ☀️")
         elif brightness < 80: tags.append("Dark 🌙")
         else: tags.append("Neutral Lighting ☁️")
 
         # 3. Color Analysis (Advanced Tone Detection)
-        img_small = img_obj.resize((1, 1))
-        r, g, b = img_small.getpixel((0, 0))
         if r > g and r > b: tags.append("Warm Tone 🔴")
         elif b > r and b > g: tags.append("Cool Tone 🔵")
         else: tags.append("Balanced Color 🎨")
@@ -148,6 +399,115 @@ def analyze_image(img_obj):
         return "Standard Photo"
     return " | ".join(tags)
 
+# --- COMMENT SENTIMENT ---
+# VADER is rule-based and much cheaper than TextBlob; repeated comments hit the LRU cache
+_sia = SentimentIntensityAnalyzer()
+
+@lru_cache(maxsize=4096)
+def _sentiment_score(text):
+    return _sia.polarity_scores(text)['compound']
+
+# --- FEED HELPERS ---
+def _photo_stats(photos, user):
+    """Batch-load counts and per-user flags for a page of photos (avoids N+1 queries in templates)."""
+    ids = [p.id for p in photos]
+    stats = {'comments': {}, 'liked_ids': set(), 'saved_ids': set()}
+    if not ids:
+        return stats
+    comments = (Comment.query.options(joinedload(Comment.user))
+                .filter(Comment.photo_id.in_(ids)).order_by(Comment.id).all())
+    for c in comments:
+        stats['comments'].setdefault(c.photo_id, []).append(c)
+    if user.is_authenticated:
+        stats['liked_ids'] = {pid for (pid,) in db.session.query(Like.photo_id)
+                              .filter(Like.user_id == user.id, Like.photo_id.in_(ids))}
+        stats['saved_ids'] = {pid for (pid,) in db.session.query(Save.photo_id)
+                              .filter(Save.user_id == user.id, Save.photo_id.in_(ids))}
+    return stats
+
+def _comment_counts(photos):
+    """Comment count per photo id in one GROUP BY query (profile grid only shows the number)."""
+    ids = [p.id for p in photos]
+    if not ids:
+        return {}
+    return dict(db.session.query(Comment.photo_id, func.count())
+                .filter(Comment.photo_id.in_(ids)).group_by(Comment.photo_id).all())
+
+# --- IMAGE VARIANTS ---
+VARIANT_WIDTHS = (1080, 800, 400)
+WEBP_SUPPORTED = features.check('webp')  # Pillow builds without libwebp can't encode variants
+if not WEBP_SUPPORTED:
+    logger.warning('Pillow has no WebP support; uploads will be served as JPEG only.')
+
+def _encode_variants(img):
+    """WebP renditions of the 1080px image for srcset, downscaled step by step: [(width, buf, length)].
+
+    Best effort: the JPEG is the source of truth, so an encode failure just yields fewer (or no) variants.
+    """
+    variants = []
+    if not WEBP_SUPPORTED:
+        return variants
+    for w in VARIANT_WIDTHS:
+        if variants and w >= max(img.size): continue  # already this small, skip a duplicate rendition
+        if max(img.size) > w:
+            img = img.copy()
+            img.thumbnail((w, w), Image.Resampling.BILINEAR)
+        buf = io.BytesIO()
+        try:
+            img.save(buf, format='WEBP', quality=80, method=4)
+        except (OSError, ValueError):
+            logger.exception('WebP encode failed at %spx; keeping %d variant(s)', w, len(variants))
+            break
+        length = buf.tell()
+        buf.seek(0)
+        variants.append((img.width, buf, length))
+    return variants
+
+# --- BACKGROUND UPLOADS ---
+def _upload_photo_blobs(photo_id, blobs):
+    """Runs on upload_executor: push the photo's blobs to Azure and mark the Photo ready/failed."""
+    with app.app_context():
+        status = 'ready'
+        try:
+            for b_name, buf, length, content_type in blobs:
+                # Known length lets the SDK stream the buffer in parallel chunks without measuring it
+                bc = container_client.upload_blob(name=b_name, data=buf, length=length, overwrite=True, max_concurrency=4,
+                                                  content_settings=ContentSettings(content_type=content_type))
+                logger.info('Uploaded to Azure: %s', bc.url)
+        except Exception:
+            logger.exception('Background Azure upload failed for photo %s', photo_id)
+            status = 'failed'
+        try:
+            Photo.query.filter_by(id=photo_id).update({'status': status})
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            logger.exception('Failed to update status for photo %s', photo_id)
+
+# --- PAGINATION ---
+PAGE_SIZE = 30
+
+def _parse_cursor(raw):
+    # cursor format: "<ISO timestamp>_<id>"
+    try:
+        ts, row_id = raw.rsplit('_', 1)
+        return datetime.fromisoformat(ts), int(row_id)
+    except (AttributeError, ValueError):
+        return None
+
+def _keyset_page(query, ts_col, id_col, raw_cursor):
+    """One page ordered by (ts_col, id_col) DESC, and the cursor for the next page (None on the last)."""
+    cursor = _parse_cursor(raw_cursor)
+    if cursor:
+        query = query.filter(tuple_(ts_col, id_col) < cursor)
+    rows = query.add_columns(ts_col, id_col).order_by(ts_col.desc(), id_col.desc()).limit(PAGE_SIZE + 1).all()
+    next_cursor = None
+    if len(rows) > PAGE_SIZE:
+        rows = rows[:PAGE_SIZE]
+        ts, row_id = rows[-1][1], rows[-1][2]
+        next_cursor = f"{ts.isoformat()}_{row_id}"
+    return [r[0] for r in rows], next_cursor
+
 # --- ROUTES ---
 
 @app.route('/')
@@ -158,24 +518,46 @@ def home():
 @login_required
 def feed():
     query = request.args.get('q')
+    photos_q = Photo.query.options(joinedload(Photo.creator)).filter(Photo.status == 'ready')
     if query:
         search_term = f"%{query}%"
-        photos = Photo.query.join(User).filter(
-            (Photo.title.ilike(search_term)) | (Photo.caption.ilike(search_term)) | 
-            (Photo.location.ilike(search_term)) | (User.username.ilike(search_term))
-        ).order_by(Photo.uploaded_at.desc()).all()
-    else:
-        photos = Photo.query.order_by(Photo.uploaded_at.desc()).all()
-    return render_template('feed.html', photos=photos)
+        # Prefix tsquery ("sun" -> 'sun:*') so partial words still match, like the ILIKE path
+        prefix_query = ' & '.join(f"{term}:*" for term in re.findall(r'\w+', query))
+        if SEARCH_TSV_ENABLED and prefix_query:
+            # Postgres: an OR across the photo/user join can't use either index, so union two index-served
+            # id lists instead (GIN prefix match on photo text, trigram ILIKE on username)
+            matching_ids = union(
+                select(Photo.id).where(db.literal_column('photo.search_tsv').op('@@')(func.to_tsquery('simple', prefix_query))),
+                select(Photo.id).where(Photo.user_id.in_(select(User.id).where(User.username.ilike(search_term)))),
+            )
+            photos_q = photos_q.filter(Photo.id.in_(matching_ids))
+        else:
+            photos_q = photos_q.join(User, Photo.user_id == User.id).filter(
+                (Photo.title.ilike(search_term)) | (Photo.caption.ilike(search_term)) | 
+                (Photo.location.ilike(search_term)) | (User.username.ilike(search_term))
+            )
+    photos, next_cursor = _keyset_page(photos_q, Photo.uploaded_at, Photo.id, request.args.get('cursor'))
+    return render_template('feed.html', photos=photos, next_cursor=next_cursor, **_photo_stats(photos, current_user))
 
 @app.route('/u/<username>')
 @login_required
 def profile(username):
-    user = User.query.filter_by(username=username).first_or_404()
-    photos = Photo.query.filter_by(user_id=user.id).order_by(Photo.uploaded_at.desc()).all()
-    saved = Photo.query.join(Save).filter(Save.user_id == user.id).all()
-    liked = Photo.query.join(Like).filter(Like.user_id == user.id).all()
-    return render_template('profile.html', user=user, photos=photos, saved_photos=saved, liked_photos=liked)
+    # Case-insensitive match (indexed on lower(username)); an exact-case match wins if both exist
+    user = (User.query.filter(func.lower(User.username) == func.lower(username))
+            .order_by((User.username == username).desc()).first_or_404())
+    posts_q = Photo.query.filter_by(user_id=user.id)
+    if current_user.id != user.id:
+        posts_q = posts_q.filter_by(status='ready')  # owners also see pending/failed uploads so they can delete them
+    photos, next_cursor = _keyset_page(posts_q, Photo.uploaded_at, Photo.id, request.args.get('cursor'))
+    post_count = posts_q.with_entities(func.count(Photo.id)).scalar()
+    # Saved/liked tabs page by when the photo was saved/liked
+    saved, saved_cursor = _keyset_page(Photo.query.join(Save).filter(Save.user_id == user.id),
+                                       Save.timestamp, Save.photo_id, request.args.get('saved_cursor'))
+    liked, liked_cursor = _keyset_page(Photo.query.join(Like).filter(Like.user_id == user.id),
+                                       Like.timestamp, Like.photo_id, request.args.get('liked_cursor'))
+    return render_template('profile.html', user=user, photos=photos, saved_photos=saved, liked_photos=liked,
+                           comment_counts=_comment_counts(photos), post_count=post_count, next_cursor=next_cursor,
+                           saved_cursor=saved_cursor, liked_cursor=liked_cursor)
 
 @app.route('/upload', methods=['GET', 'POST'])
 @login_required
@@ -188,44 +570,59 @@ def creator_dashboard():
         if file:
             filename = secure_filename(file.filename)
             try:
-                img = Image.open(file)
+                # Decode once at reduced size, then analyse and encode the 1080px copy
+                img = Image.open(file.stream)
+                source_size = img.size
+                img.draft('RGB', (1080, 1080))  # JPEG only: libjpeg DCT-scaled decode
                 if img.mode != 'RGB': img = img.convert('RGB')
-                auto_tags = analyze_image(img)
-                img.thumbnail((1080, 1080))
+                img.thumbnail((1080, 1080), Image.Resampling.BILINEAR)
+                auto_tags = analyze_image(img, source_size)
 
-                # Cloud upload if configured
-                if blob_service_client and AZURE_CONTAINER_NAME:
-                    logger.info('Uploading photo to Azure for user %s', current_user.username)
+                b_name = f"{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{filename}"
+                webp = [(w, f"{os.path.splitext(b_name)[0]}_{w}.webp", vbuf, vlen)
+                        for w, vbuf, vlen in _encode_variants(img)]
+
+                # Cloud upload if configured (blob transfer happens in the background)
+                pending_blobs = None
+                if container_client:
+                    logger.info('Queueing Azure upload for user %s', current_user.username)
                     buf = io.BytesIO()
-                    img.save(buf, format='JPEG', optimize=True, quality=85)
+                    img.save(buf, format='JPEG', quality=85, progressive=True)
+                    length = buf.tell()
                     buf.seek(0)
-                    b_name = f"{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{filename}"
-                    bc = blob_service_client.get_blob_client(container=AZURE_CONTAINER_NAME, blob=b_name)
-                    bc.upload_blob(buf, overwrite=True)
-                    file_url = bc.url
-                    logger.info('Uploaded to Azure: %s', file_url)
+                    file_url = container_client.get_blob_client(b_name).url
+                    variants = {w: container_client.get_blob_client(v_name).url for w, v_name, _, _ in webp}
+                    pending_blobs = [(b_name, buf, length, 'image/jpeg')] + \
+                                    [(v_name, vbuf, vlen, 'image/webp') for _, v_name, vbuf, vlen in webp]
                 elif LOCAL_UPLOAD_FOLDER:
                     # Local fallback
                     logger.info('Saving photo locally for user %s', current_user.username)
-                    b_name = f"{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{filename}"
                     local_path = os.path.join(LOCAL_UPLOAD_FOLDER, b_name)
                     try:
-                        img.save(local_path, format='JPEG', optimize=True, quality=85)
+                        img.save(local_path, format='JPEG', quality=85, progressive=True)
                     except Exception:
                         file.stream.seek(0)
                         with open(local_path, 'wb') as f:
-                            f.write(file.stream.read())
+                            shutil.copyfileobj(file.stream, f, length=1024 * 1024)
                     file_url = url_for('static', filename=f'uploads/{b_name}', _external=True)
+                    variants = {}
+                    for w, v_name, vbuf, _ in webp:
+                        with open(os.path.join(LOCAL_UPLOAD_FOLDER, v_name), 'wb') as f:
+                            f.write(vbuf.getbuffer())
+                        variants[w] = url_for('static', filename=f'uploads/{v_name}', _external=True)
                 else:
                     flash('No storage configured for uploads.', 'danger')
                     return render_template('dashboard.html')
 
                 new_photo = Photo(filename=file_url, title=request.form.get('title'),
                                   caption=request.form.get('caption'), location=request.form.get('location'),
-                                  people_present=request.form.get('people'), auto_tags=auto_tags, user_id=current_user.id)
+                                  people_present=request.form.get('people'), auto_tags=auto_tags, user_id=current_user.id,
+                                  variants=variants or None, status='pending' if pending_blobs else 'ready')
                 db.session.add(new_photo)
                 db.session.commit()
-                flash('✓ Photo uploaded!', 'success')
+                if pending_blobs:
+                    upload_executor.submit(_upload_photo_blobs, new_photo.id, pending_blobs)
+                flash('✓ Photo uploaded! It will appear in the feed once processing finishes.' if pending_blobs else '✓ Photo uploaded!', 'success')
                 return redirect(url_for('profile', username=current_user.username))
             except Exception:
                 logger.exception('Photo upload failed')
@@ -241,7 +638,7 @@ def register():
         if User.query.filter_by(username=request.form.get('username')).first():
             flash('Username taken', 'danger'); return redirect(url_for('register'))
         new_user = User(username=request.form.get('username'), role=role,
-                        password=generate_password_hash(request.form.get('password')))
+                        password=password_hasher.hash(request.form.get('password')))
         db.session.add(new_user); db.session.commit()
         flash(f'Account created as {role.title()}! Please log in.', 'success')
         return redirect(url_for('login'))
@@ -251,7 +648,7 @@ def register():
 def login():
     if request.method == 'POST':
         user = User.query.filter_by(username=request.form.get('username')).first()
-        if user and check_password_hash(user.password, request.form.get('password')):
+        if user and verify_password(user, request.form.get('password')):
             if user.role == request.form.get('role'):
                 login_user(user)
                 return redirect(url_for('creator_dashboard' if user.role == 'creator' else 'feed'))
@@ -268,10 +665,10 @@ def edit_profile():
         if avatar and avatar.filename != '':
             try:
                 avatar_filename = secure_filename(avatar.filename)
-                if blob_service_client and AZURE_CONTAINER_NAME:
+                if container_client:
                     b_name = f"avatar_{current_user.id}_{avatar_filename}"
-                    bc = blob_service_client.get_blob_client(container=AZURE_CONTAINER_NAME, blob=b_name)
-                    bc.upload_blob(avatar, overwrite=True)
+                    bc = container_client.upload_blob(name=b_name, data=avatar.stream, overwrite=True,
+                                                      content_settings=ContentSettings(content_type=avatar.mimetype))
                     current_user.avatar = bc.url
                     logger.info('Uploaded avatar to Azure for user %s', current_user.username)
                 else:
@@ -279,19 +676,22 @@ def edit_profile():
                     local_name = f"avatar_{current_user.id}_{avatar_filename}"
                     local_path = os.path.join(LOCAL_UPLOAD_FOLDER, local_name)
                     try:
-                        img = Image.open(avatar)
+                        img = Image.open(avatar.stream)
+                        img.draft('RGB', (400, 400))  # JPEG only: decode at reduced DCT scale
                         if img.mode != 'RGB': img = img.convert('RGB')
-                        img.thumbnail((400, 400))
+                        img.thumbnail((400, 400), Image.Resampling.BILINEAR)
                         img.save(local_path, format='JPEG', optimize=True, quality=85)
                     except Exception:
                         avatar.stream.seek(0)
                         with open(local_path, 'wb') as f:
-                            f.write(avatar.stream.read())
+                            shutil.copyfileobj(avatar.stream, f, length=1024 * 1024)
                     current_user.avatar = local_name
                     logger.info('Saved avatar locally: %s', local_path)
             except Exception:
                 logger.exception('Avatar upload failed for user %s', getattr(current_user, 'username', None))
         db.session.commit()
+        with _USER_CACHE_LOCK:
+            _USER_CACHE.pop(current_user.id, None)
         flash('Profile updated!', 'success')
         return redirect(url_for('profile', username=current_user.username))
     return render_template('edit_profile.html')
@@ -301,7 +701,7 @@ def edit_profile():
 def add_comment(photo_id):
     text = request.form.get('text')
     # Sentiment Analysis (Advanced Distinction Feature)
-    score = TextBlob(text).sentiment.polarity
+    score = _sentiment_score(' '.join(text.split()))
     if score < -0.3:
         return jsonify({'success': False, 'message': 'AI Blocked: Negative content! 🚫'})
     # classify sentiment for UI badge
@@ -313,37 +713,110 @@ def add_comment(photo_id):
     db.session.commit()
     return jsonify({'success': True, 'username': current_user.username, 'text': text, 'sentiment': sentiment})
 
+# --- PREBUILT TOGGLE STATEMENTS ---
+# Built once at import with bind parameters, so like/save toggles reuse cached compiled SQL
+def _toggle_stmts(model):
+    match = (model.user_id == bindparam('u'), model.photo_id == bindparam('p'))
+    return (select(exists().where(*match)),
+            insert(model).values(user_id=bindparam('u'), photo_id=bindparam('p')),
+            delete(model).where(*match).execution_options(synchronize_session=False))
+
+PHOTO_EXISTS_STMT = select(exists().where(Photo.id == bindparam('p')))
+LIKE_EXISTS_STMT, LIKE_INSERT_STMT, LIKE_DELETE_STMT = _toggle_stmts(Like)
+SAVE_EXISTS_STMT, SAVE_INSERT_STMT, SAVE_DELETE_STMT = _toggle_stmts(Save)
+LIKES_COUNT_STMT = (update(Photo).where(Photo.id == bindparam('p'))
+                    .values(likes_count=Photo.likes_count + bindparam('delta'))
+                    .returning(Photo.likes_count)
+                    .execution_options(synchronize_session=False))
+
+# Postgres: delete-or-insert in one statement via data-modifying CTEs (the like counter rides along).
+# The insert skips a missing photo instead of tripping the FK, and the statement then returns no row (404).
+PG_LIKE_TOGGLE_SQL = db.text("""
+    WITH del AS (DELETE FROM likes WHERE user_id = :u AND photo_id = :p RETURNING 1),
+         ins AS (INSERT INTO likes (user_id, photo_id, timestamp)
+                 SELECT :u, :p, :ts WHERE NOT EXISTS (SELECT 1 FROM del) AND EXISTS (SELECT 1 FROM photo WHERE id = :p)
+                 ON CONFLICT (user_id, photo_id) DO NOTHING RETURNING 1)
+    UPDATE photo SET likes_count = likes_count + (SELECT count(*) FROM ins) - (SELECT count(*) FROM del)
+    WHERE id = :p
+    RETURNING likes_count, NOT EXISTS (SELECT 1 FROM del) AS liked
+""")
+PG_SAVE_TOGGLE_SQL = db.text("""
+    WITH del AS (DELETE FROM saves WHERE user_id = :u AND photo_id = :p RETURNING 1),
+         ins AS (INSERT INTO saves (user_id, photo_id, timestamp)
+                 SELECT :u, :p, :ts WHERE NOT EXISTS (SELECT 1 FROM del) AND EXISTS (SELECT 1 FROM photo WHERE id = :p)
+                 ON CONFLICT (user_id, photo_id) DO NOTHING RETURNING 1)
+    SELECT NOT EXISTS (SELECT 1 FROM del) AS saved FROM photo WHERE id = :p
+""")
+
 @app.route('/like/<int:photo_id>', methods=['POST'])
 @login_required
 def toggle_like(photo_id):
-    photo = Photo.query.get_or_404(photo_id)
-    existing = Like.query.filter_by(user_id=current_user.id, photo_id=photo_id).first()
-    if existing:
-        db.session.delete(existing)
+    params = {'u': current_user.id, 'p': photo_id}
+    if db.engine.dialect.name == 'postgresql':
+        row = db.session.execute(PG_LIKE_TOGGLE_SQL, {**params, 'ts': datetime.utcnow()}).one_or_none()
+        db.session.commit()
+        if row is None:
+            abort(404)
+        return jsonify({'count': row.likes_count, 'liked': row.liked})
+    if not db.session.execute(PHOTO_EXISTS_STMT, params).scalar():
+        abort(404)
+    if db.session.execute(LIKE_EXISTS_STMT, params).scalar():
+        db.session.execute(LIKE_DELETE_STMT, params)
         liked = False
     else:
-        db.session.add(Like(user_id=current_user.id, photo_id=photo_id))
+        db.session.execute(LIKE_INSERT_STMT, params)
         liked = True
+    # Bump the counter in the same transaction; the UPDATE's row lock keeps it consistent
+    count = db.session.execute(LIKES_COUNT_STMT, {'p': photo_id, 'delta': 1 if liked else -1}).scalar_one()
     db.session.commit()
-    count = photo.likes.count()
     return jsonify({'count': count, 'liked': liked})
 
 
 @app.route('/save/<int:photo_id>', methods=['POST'])
 @login_required
 def toggle_save(photo_id):
-    photo = Photo.query.get_or_404(photo_id)
-    existing = Save.query.filter_by(user_id=current_user.id, photo_id=photo_id).first()
-    if existing:
-        db.session.delete(existing)
+    params = {'u': current_user.id, 'p': photo_id}
+    if db.engine.dialect.name == 'postgresql':
+        saved = db.session.execute(PG_SAVE_TOGGLE_SQL, {**params, 'ts': datetime.utcnow()}).scalar_one_or_none()
+        db.session.commit()
+        if saved is None:
+            abort(404)
+        return jsonify({'saved': saved})
+    if not db.session.execute(PHOTO_EXISTS_STMT, params).scalar():
+        abort(404)
+    if db.session.execute(SAVE_EXISTS_STMT, params).scalar():
+        db.session.execute(SAVE_DELETE_STMT, params)
         saved = False
     else:
-        db.session.add(Save(user_id=current_user.id, photo_id=photo_id))
+        db.session.execute(SAVE_INSERT_STMT, params)
         saved = True
     db.session.commit()
     return jsonify({'saved': saved})
 
 
+def _delete_stored_file(url):
+    if url and url.startswith('http') and container_client:
+        # extract blob name after container path
+        parts = url.split(f"/{AZURE_CONTAINER_NAME}/")
+        if len(parts) == 2:
+            blob_name = parts[1]
+            try:
+                container_client.get_blob_client(blob_name).delete_blob()
+                logger.info('Deleted Azure blob: %s', blob_name)
+            except Exception:
+                logger.exception('Failed deleting Azure blob %s', blob_name)
+    else:
+        # local file path handling
+        if '/static/uploads/' in (url or ''):
+            fname = url.split('/static/uploads/')[-1]
+            p = os.path.join(LOCAL_UPLOAD_FOLDER, fname)
+            if os.path.exists(p):
+                try:
+                    os.remove(p)
+                    logger.info('Deleted local file: %s', p)
+                except Exception:
+                    logger.exception('Failed to delete local file: %s', p)
+
 @app.route('/post/<int:photo_id>/delete', methods=['POST'])
 @login_required
 def delete_post(photo_id):
@@ -352,31 +825,12 @@ def delete_post(photo_id):
     if photo.user_id != current_user.id:
         return jsonify({'success': False, 'message': 'Not authorized'}), 403
 
-    # Attempt to delete stored file (Azure blob or local)
-    try:
-        if photo.filename and photo.filename.startswith('http') and AZURE_CONTAINER_NAME and blob_service_client:
-            # extract blob name after container path
-            parts = photo.filename.split(f"/{AZURE_CONTAINER_NAME}/")
-            if len(parts) == 2:
-                blob_name = parts[1]
-                try:
-                    blob_service_client.get_blob_client(container=AZURE_CONTAINER_NAME, blob=blob_name).delete_blob()
-                    logger.info('Deleted Azure blob: %s', blob_name)
-                except Exception:
-                    logger.exception('Failed deleting Azure blob %s', blob_name)
-        else:
-            # local file path handling
-            if '/static/uploads/' in (photo.filename or ''):
-                fname = photo.filename.split('/static/uploads/')[-1]
-                p = os.path.join(LOCAL_UPLOAD_FOLDER, fname)
-                if os.path.exists(p):
-                    try:
-                        os.remove(p)
-                        logger.info('Deleted local file: %s', p)
-                    except Exception:
-                        logger.exception('Failed to delete local file: %s', p)
-    except Exception:
-        logger.exception('Error while attempting to remove stored file for photo %s', photo_id)
+    # Attempt to delete stored files (Azure blob or local), including WebP variants
+    for url in [photo.filename] + list((photo.variants or {}).values()):
+        try:
+            _delete_stored_file(url)
+        except Exception:
+            logger.exception('Error while attempting to remove stored file for photo %s', photo_id)
 
     try:
         db.session.delete(photo)
@@ -402,15 +856,15 @@ def debug_recent_photos():
         if pid:
             return delete_post(int(pid))
 
-    photos = Photo.query.order_by(Photo.uploaded_at.desc()).limit(50).all()
-    # simple HTML table for quick debugging
-    rows = ['<h3>Recent Photos (creator debug)</h3>', '<table class="table"><tr><th>ID</th><th>Filename</th><th>Action</th></tr>']
-    for p in photos:
-        rows.append(f"<tr><td>{p.id}</td><td style='max-width:400px;word-break:break-all'>{p.filename}</td>"
-                    f"<td><form method='post' style='display:inline'><input type='hidden' name='photo_id' value='{p.id}'/>"
-                    f"<button class='btn btn-sm btn-danger' type='submit'>Delete</button></form></td></tr>")
-    rows.append('</table>')
-    return '\n'.join(rows)
+    # simple HTML table for quick debugging, streamed row by row
+    def rows():
+        yield '<h3>Recent Photos (creator debug)</h3>\n<table class="table"><tr><th>ID</th><th>Filename</th><th>Action</th></tr>\n'
+        for p in Photo.query.with_entities(Photo.id, Photo.filename).order_by(Photo.uploaded_at.desc()).limit(50):
+            yield (f"<tr><td>{p.id}</td><td style='max-width:400px;word-break:break-all'>{p.filename}</td>"
+                   f"<td><form method='post' style='display:inline'><input type='hidden' name='photo_id' value='{p.id}'/>"
+                   f"<button class='btn btn-sm btn-danger' type='submit'>Delete</button></form></td></tr>\n")
+        yield '</table>'
+    return Response(stream_with_context(rows()), mimetype='text/html')
 
 @app.route('/logout')
 @login_required
@@ -419,7 +873,7 @@ def logout():
 
 @app.route('/_health')
 def health():
-    return jsonify({'status': 'ok', 'storage': bool(blob_service_client)})
+    return jsonify({'status': 'ok', 'storage': bool(container_client)})
 
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", 5000))
@@ -10,30 +10,34 @@ followers = db.Table('followers',
     db.Column('followed_id', db.Integer, db.ForeignKey('user.id'))
 )
 
+# Likes/Saves PK is (user_id, photo_id), which already covers per-user lookups;
+# the extra (photo_id, user_id) index serves per-photo counts and joins.
 class Like(db.Model):
     __tablename__ = 'likes'
+    __table_args__ = (db.Index('ix_likes_photo_user', 'photo_id', 'user_id'),)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
     photo_id = db.Column(db.Integer, db.ForeignKey('photo.id'), primary_key=True)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
 class Save(db.Model):
     __tablename__ = 'saves'
+    __table_args__ = (db.Index('ix_saves_photo_user', 'photo_id', 'user_id'),)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
     photo_id = db.Column(db.Integer, db.ForeignKey('photo.id'), primary_key=True)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
 class Comment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     text = db.Column(db.String(500), nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    photo_id = db.Column(db.Integer, db.ForeignKey('photo.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    photo_id = db.Column(db.Integer, db.ForeignKey('photo.id'), nullable=False, index=True)
     user = db.relationship('User', backref='comments')
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(150), unique=True, nullable=False)
-    # FIX: Password limit increased to 255 to handle scrypt hashing
+    # FIX: Password limit increased to 255 to handle scrypt/argon2 hashing
     password = db.Column(db.String(255), nullable=False) 
     role = db.Column(db.String(50), nullable=False, default='consumer')
     bio = db.Column(db.String(300))
@@ -53,9 +57,11 @@ class User(UserMixin, db.Model):
     def unfollow(self, user):
         if self.is_following(user): self.followed.remove(user)
     def is_following(self, user):
-        return self.followed.filter(followers.c.followed_id == user.id).count() > 0
+        return db.session.query(self.followed.filter(followers.c.followed_id == user.id).exists()).scalar()
 
 class Photo(db.Model):
+    # (uploaded_at, id) backs keyset pagination of the feed and profile grids
+    __table_args__ = (db.Index('ix_photo_uploaded_at_id', 'uploaded_at', 'id'),)
     id = db.Column(db.Integer, primary_key=True)
     # FIX: Filename limit 255 to store long S3 URLs
     filename = db.Column(db.String(255), nullable=False)
@@ -66,16 +72,22 @@ class Photo(db.Model):
     
     # --- AUTOMATED MEDIA ANALYSIS TAGS ---
     auto_tags = db.Column(db.String(300)) 
+    # 'pending' while the blob upload runs in the background, then 'ready' (or 'failed')
+    status = db.Column(db.String(20), nullable=False, default='ready', server_default='ready')
+    # Denormalized like counter, kept in step with the likes table by toggle_like
+    likes_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Smaller WebP renditions for srcset: {width: url}
+    variants = db.Column(db.JSON)
     
-    uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    uploaded_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     
     creator = db.relationship('User', backref='photos')
-    likes = db.relationship('Like', backref='photo', lazy='dynamic')
-    saves = db.relationship('Save', backref='photo', lazy='dynamic')
-    comments = db.relationship('Comment', backref='photo', lazy='dynamic', cascade="all, delete-orphan")
+    likes = db.relationship('Like', backref='photo', lazy='select')
+    saves = db.relationship('Save', backref='photo', lazy='select')
+    comments = db.relationship('Comment', backref='photo', lazy='select', cascade="all, delete-orphan")
 
     def is_liked_by(self, user):
-        return self.likes.filter_by(user_id=user.id).count() > 0
+        return db.session.query(Like.query.filter_by(user_id=user.id, photo_id=self.id).exists()).scalar()
     def is_saved_by(self, user):
-        return self.saves.filter_by(user_id=user.id).count() > 0
\ No newline at end of file
+        return db.session.query(Save.query.filter_by(user_id=user.id, photo_id=self.id).exists()).scalar()
\ No newline at end of file